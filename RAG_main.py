@@ -1,70 +1,127 @@
-from transformers import pipeline,AutoTokenizer,BitsAndBytesConfig,AutoModelForCausalLM
-from langchain_huggingface import HuggingFacePipeline
-from langchain.chains import RetrievalQA
 from langchain_community.llms import ollama
 from langchain_community.vectorstores import FAISS
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_ollama.llms import OllamaLLM
 import faiss
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.embeddings import OllamaEmbeddings
-from sentence_transformers import SentenceTransformer
 from langchain.prompts import PromptTemplate
+from ollama import Client
+import json
+import threading
+import time
+from collections import deque
+# Fixed instructions come first in the prompt so every call shares one token prefix
+from prompts import custom_prompt_template, static_prompt_prefix
+from vector_index import ScoredRetriever, load_vectorstore
+from sharded_store import ShardedRetriever, is_sharded, load_shards
+from source_store import is_converted, lookup_rows
+from snapshots import IndexManager
 
 model_name_1 = "qwen3:4b"
 
 #hf_pipe=pipeline("text-generation",model=model_main,tokenizer=tokenizer,temperature=0.1,top_p=0.75,max_new_tokens=32000)
 #llm = HuggingFacePipeline(pipeline=hf_pipe)
 
-model_name = "sentence-transformers/all-MiniLM-L6-v2"
-try:
-    # This will download and cache the model
-    temp_model = SentenceTransformer(model_name)
-    print("Model downloaded successfully!")
-except:
-    print("Model download failed, trying alternative...")
-    model_name = "all-MiniLM-L6-v2"
-
-model_kwargs = {'device': 'cpu'}  # Use 'cuda' if GPU available
-encode_kwargs = {'normalize_embeddings': False}
-hf_embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs=model_kwargs,
-    encode_kwargs=encode_kwargs
-)
-
-vectorstore = FAISS.load_local(folder_path="weather_faiss_vectorstore_main",allow_dangerous_deserialization=True,embeddings=hf_embeddings)
-
-retriever=vectorstore.as_retriever(search_type="similarity",search_kwargs={"k":3})  # Increased k for better context
-
-llm=OllamaLLM(model=model_name_1,base_url="http://localhost:11434",num_predict=2048,temperature=0.1,top_p=0.75)
-
-# Create custom prompt template for oceanographic data
-custom_prompt_template = """You are an expert oceanographer analyzing marine data. Use the following oceanographic data to answer the question.
-
-The data contains measurements with this structure:
-- Numbers represent: [ID] [Depth] [Pressure] [Temperature] [Salinity] [Station_ID] [Other] [Latitude] [Longitude] [Timestamp] [Date]
-- Temperature is in degrees Celsius
-- Salinity is in practical salinity units (PSU)  
-- Depth/Pressure measurements in meters/decibars
-- Coordinates are in decimal degrees (negative values indicate South/West)
-- Dates are in YYYY-MM-DD format
-
-Context Data:
-{context}
-
-Question: {question}
-
-When answering:
-- Look for exact date first, then within ±7 days if needed
-- If using nearby date data, mention the actual date and day difference
-- Provide specific measurements with units
-- Include location coordinates
-- Be direct and concise
-- Do not repeat these instructions in your response
-- Focus only on the data and findings
-
-Answer:"""
+# Set to True after `python query_encoder.py --export` to embed questions with the
+# int8 ONNX encoder instead of PyTorch (vectors are checked for parity with the index)
+use_onnx_encoder = False
+onnx_model_dir = "minilm_onnx"
+
+if use_onnx_encoder:
+    from query_encoder import OnnxQueryEmbeddings
+    hf_embeddings = OnnxQueryEmbeddings(onnx_model_dir)
+else:
+    # PyTorch is only imported when the ONNX encoder is not used
+    from sentence_transformers import SentenceTransformer
+    from langchain_huggingface import HuggingFaceEmbeddings
+    model_name = "sentence-transformers/all-MiniLM-L6-v2"
+    try:
+        # This will download and cache the model
+        temp_model = SentenceTransformer(model_name)
+        print("Model downloaded successfully!")
+    except:
+        print("Model download failed, trying alternative...")
+        model_name = "all-MiniLM-L6-v2"
+
+    model_kwargs = {'device': 'cpu'}  # Use 'cuda' if GPU available
+    encode_kwargs = {'normalize_embeddings': False}
+    hf_embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+
+snapshot_root = "index_snapshots"  # versions published by embed_gen.py
+vectorstore_folder = "weather_faiss_vectorstore_main"  # used when no snapshot has been published
+source_dataset = "argo_dataset"  # Parquet dataset written by embed_gen.py / source_store.py
+
+# Dynamic k, meaningful for indexes built with metric = "cosine" in embed_gen.py where
+# scores are cosine similarities: keep up to k documents scoring at least score_threshold
+# and within score_margin of the best one. With no documents left the LLM is skipped.
+k = 3  # Increased k for better context
+score_threshold = None  # e.g. 0.35
+score_margin = None  # e.g. 0.1
+no_match_answer = "No matching oceanographic data was found for this question."
+
+def load_retriever(folder):
+    if is_sharded(folder):
+        # Shards written by embed_gen.py with shard_by set, searched in parallel and merged
+        return ShardedRetriever(shards=load_shards(folder, hf_embeddings), embeddings=hf_embeddings,
+                                k=k, score_threshold=score_threshold, score_margin=score_margin)
+    # Encoding (flat/sq8/pq/binary) and metric are read from the index metadata written by embed_gen.py
+    vectorstore = load_vectorstore(folder, hf_embeddings)
+    return ScoredRetriever(vectorstore=vectorstore, k=k, score_threshold=score_threshold, score_margin=score_margin)
+
+# New snapshots are loaded in the background and swapped in; queries already
+# running keep the index they started with
+index_manager = IndexManager(load_retriever, snapshot_root, fallback_path=vectorstore_folder, poll_interval=30)
+index_manager.start_watching()
+
+ollama_url = "http://localhost:11434"
+# Keep the model loaded between sparse queries; the warm ping below refreshes it
+# well before keep_alive runs out and re-fills the static prompt prefix in Ollama's cache
+keep_alive = "30m"
+warm_interval = 240  # seconds
+
+llm=OllamaLLM(model=model_name_1,base_url=ollama_url,num_predict=2048,temperature=0.1,top_p=0.75,keep_alive=keep_alive)
+
+llm_timings = deque(maxlen=100)  # per call load/prefill/decode timings, newest last
+
+def ollama_timings(info):
+    """Milliseconds and token counts from the final Ollama response"""
+    return {
+        "load_ms": info.get("load_duration", 0) / 1e6,
+        "prefill_ms": info.get("prompt_eval_duration", 0) / 1e6,
+        "prompt_tokens": info.get("prompt_eval_count", 0),
+        "decode_ms": info.get("eval_duration", 0) / 1e6,
+        "output_tokens": info.get("eval_count", 0),
+    }
+
+def timings():
+    """Average load/prefill/decode timings over the recent LLM calls (empty dict before the first call)"""
+    recent = list(llm_timings)
+    if not recent:
+        return {}
+    summary = {key: sum(t[key] for t in recent) / len(recent) for key in recent[0]}
+    summary["calls"] = len(recent)
+    return summary
+
+def warm_model():
+    """Load the model if needed and prefill the static prompt prefix"""
+    client = Client(host=ollama_url)
+    response = client.generate(model=model_name_1, prompt=static_prompt_prefix, keep_alive=keep_alive,
+                               options={"num_predict": 1, "temperature": 0.1, "top_p": 0.75})
+    return ollama_timings(dict(response))
+
+def keep_warm():
+    while True:
+        try:
+            warm_model()
+        except Exception as e:
+            print(f"Warm ping to Ollama failed: {str(e)}")
+        time.sleep(warm_interval)
+
+threading.Thread(target=keep_warm, name="ollama-keep-warm", daemon=True).start()
 
 # Create the prompt template
 PROMPT = PromptTemplate(
@@ -72,21 +129,44 @@ PROMPT = PromptTemplate(
     input_variables=["context", "question"]
 )
 
-# Create QA chain with custom prompt
-qa_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type="stuff",
-    retriever=retriever,
-    return_source_documents=True,
-    chain_type_kwargs={"prompt": PROMPT}
-)
+def generate_answer(context, question):
+    """Run the LLM on the filled prompt and record Ollama's timings, prefill separately from decode"""
+    result = llm.generate([PROMPT.format(context=context, question=question)])
+    generation = result.generations[0][0]
+    call_timings = ollama_timings(generation.generation_info or {})
+    llm_timings.append(call_timings)
+    print(f"LLM prefill {call_timings['prefill_ms']:.0f} ms ({call_timings['prompt_tokens']} prompt tokens evaluated), "
+          f"decode {call_timings['decode_ms']:.0f} ms, load {call_timings['load_ms']:.0f} ms")
+    return generation.text
 
 def run_query(query):
-    result = qa_chain.invoke({"query": query})
-    return result['result'], len(result['source_documents']), result['source_documents']
+    # Retrieve first so questions with no close enough match never reach the LLM
+    source_docs = index_manager.current().retrieve(query)
+    if not source_docs:
+        return no_match_answer, 0, []
+    # Same context layout as the "stuff" chain
+    context = "\n\n".join(doc.page_content for doc in source_docs)
+    answer = generate_answer(context, query)
+    return answer, len(source_docs), source_docs
+
+def source_rows(docs, columns=None):
+    """Typed source rows (pandas DataFrame indexed by row_index) behind the retrieved documents"""
+    return lookup_rows(
+        [doc.metadata["row_index"] for doc in docs],
+        dataset_dir=source_dataset,
+        columns=columns,
+        dates=[doc.metadata["date"] for doc in docs if doc.metadata.get("date")]
+    )
+
+def source_records(docs, columns=None):
+    """source_rows as JSON-ready dicts (row_index included), empty when the Parquet dataset is missing"""
+    if not docs or not is_converted(source_dataset):
+        return []
+    frame = source_rows(docs, columns).reset_index()
+    return json.loads(frame.to_json(orient="records", date_format="iso", default_handler=str))
 
 def show_retrieved_docs(docs):
-    """Helper function to display retrieved documents"""
+    """Helper function to display retrieved documents and their typed source rows"""
     print("\n" + "="*60)
     print("RETRIEVED DOCUMENTS:")
     print("="*60)
@@ -95,6 +175,9 @@ def show_retrieved_docs(docs):
         print(f"Metadata: {doc.metadata}")
         print(f"Content: {doc.page_content}")
         print("-" * 40)
+    if docs and is_converted(source_dataset):
+        print("SOURCE ROWS:")
+        print(source_rows(docs).to_string())
 
 def main(query):
     answer, num_docs, source_docs = run_query(query)
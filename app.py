@@ -4,6 +4,8 @@ import re
 from typing import List, Dict, Tuple, Optional
 import json
 from RAG_main import main
+from query_jobs import JobQueue, QueueFull, DONE, FAILED, CANCELLED
+from chat_view import init_history, trim_history, render_history, render_pending
 
 # RAG Output Cleaning Functions
 def clean_rag_output(raw_output: str) -> str:
@@ -157,12 +159,8 @@ def clean_and_format_ocean_response(query: str, raw_response: str) -> str:
 # Streamlit App Configuration
 st.set_page_config(page_title="FloatChat", layout="wide")
 
-# Initialize session state for chat history
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-
-if 'is_processing' not in st.session_state:
-    st.session_state.is_processing = False
+# Initialize session state for chat history (bounded, older messages spill to disk)
+init_history(st.session_state)
 
 # Custom CSS for the perfected layout and styling
 st.markdown("""
@@ -420,15 +418,33 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Function to handle quick query buttons
-def handle_quick_query(query: str):
-    """Handle quick query button clicks"""
+# Function to queue a query from the chat form or the quick query buttons
+def submit_query(query: str):
+    """Add the user message and queue the query on the background workers"""
     st.session_state.chat_history.append({
         "type": "user",
         "message": query,
         "timestamp": time.strftime("%I:%M %p")
     })
-    st.session_state.is_processing = True
+    try:
+        job_id = get_job_queue().submit(query)
+    except QueueFull:
+        st.session_state.chat_history.append({
+            "type": "bot",
+            "message": "⏳ FloatChat is busy answering other questions right now. Please try again in a moment.",
+            "timestamp": time.strftime("%I:%M %p")
+        })
+        trim_history(st.session_state)
+        return
+    # Answer is filled in by sync_jobs once the job finishes
+    st.session_state.chat_history.append({
+        "type": "bot",
+        "message": None,
+        "job_id": job_id,
+        "timestamp": time.strftime("%I:%M %p")
+    })
+    sync_jobs()
+    trim_history(st.session_state)
 
 # Function to process user query
 def process_query(query: str) -> str:
@@ -444,6 +460,57 @@ def process_query(query: str) -> str:
     except Exception as e:
         return f"🚫 Sorry, I encountered an error processing your query: {str(e)}"
 
+# Shared by all sessions: 2 workers matches a default Ollama server, further
+# queries wait in the queue and beyond 16 waiting queries new ones are refused
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    return JobQueue(process_query, max_workers=2, max_pending=16)
+
+def sync_jobs() -> bool:
+    """Copy finished job results into the chat history, returns True while any job is still running"""
+    queue = get_job_queue()
+    waiting = []
+    for message in st.session_state.chat_history:
+        if message["type"] != "bot" or message["message"] is not None:
+            continue
+        job = queue.get(message["job_id"])
+        if job is None:
+            message["message"] = "🚫 This query expired before its answer could be shown."
+        elif job.status == DONE:
+            message["message"] = job.result
+        elif job.status == FAILED:
+            message["message"] = f"🚫 Sorry, I encountered an error processing your query: {job.error}"
+        elif job.status == CANCELLED:
+            message["message"] = "Query cancelled."
+        else:
+            waiting.append(message["job_id"])
+            continue
+        message["timestamp"] = time.strftime("%I:%M %p")
+
+    # Job ids in the URL let a refreshed page pick the answers up again
+    if waiting:
+        st.query_params["jobs"] = ",".join(waiting)
+    elif "jobs" in st.query_params:
+        del st.query_params["jobs"]
+    return bool(waiting)
+
+# A browser refresh starts a new session: re-attach queries still in flight
+if 'jobs_restored' not in st.session_state:
+    st.session_state.jobs_restored = True
+    for job_id in st.query_params.get("jobs", "").split(","):
+        job = get_job_queue().get(job_id) if job_id else None
+        if job is not None:
+            st.session_state.chat_history.append({"type": "user", "message": job.query, "timestamp": time.strftime("%I:%M %p")})
+            st.session_state.chat_history.append({"type": "bot", "message": None, "job_id": job_id, "timestamp": time.strftime("%I:%M %p")})
+
+# Polls the job queue without blocking the rest of the page and re-renders only
+# the pending answers; once every answer is in, one full rerun shows them
+@st.fragment(run_every=1.0)
+def polling_pending_answers():
+    if not sync_jobs():
+        st.rerun()
+    render_pending(st.session_state, get_job_queue().cancel)
+
 # ---- Navigation Bar ---- (FIXED: Removed duplicate)
 with st.container():
     st.markdown(
@@ -561,7 +628,7 @@ with chat_col1:
     
     for query in quick_queries:
         if st.button(query, key=f"quick_{query}", use_container_width=True):
-            handle_quick_query(query)
+            submit_query(query)
             st.rerun()
     
     st.markdown("""
@@ -594,41 +661,11 @@ with chat_col2:
     with chat_container:
         st.markdown('<div style="height: 300px; overflow-y: auto; margin-bottom: 20px; padding: 10px;">', unsafe_allow_html=True)
         
-        # Display chat history
-        for message in st.session_state.chat_history:
-            if message["type"] == "user":
-                st.markdown(f"""
-                    <div class="chat-message user-message">
-                        <div class="message-bubble user-bubble">
-                            <p style="font-size: 0.9em; margin: 0;">{message["message"]}</p>
-                            <span class="message-time user-time">{message["timestamp"]}</span>
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                    <div class="chat-message bot-message">
-                        <div class="message-bubble bot-bubble">
-                            <p style="font-size: 0.9em; margin: 0;">{message["message"]}</p>
-                            <span class="message-time bot-time">{message["timestamp"]}</span>
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
-        
-        # Show typing indicator if processing
-        if st.session_state.is_processing:
-            st.markdown("""
-                <div class="chat-message bot-message">
-                    <div class="typing-indicator">
-                        <span style="margin-right: 8px;">FloatChat is thinking</span>
-                        <div class="typing-dots">
-                            <div class="typing-dot"></div>
-                            <div class="typing-dot"></div>
-                            <div class="typing-dot"></div>
-                        </div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+        # Display the recent chat history, polling for answers while queries are in flight
+        waiting = sync_jobs()
+        render_history(st.session_state)
+        if waiting:
+            polling_pending_answers()
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -644,34 +681,12 @@ with chat_col2:
         
         # Process form submission
         if submit_button and user_input.strip():
-            # Add user message to chat history
-            st.session_state.chat_history.append({
-                "type": "user",
-                "message": user_input.strip(),
-                "timestamp": time.strftime("%I:%M %p")
-            })
-            st.session_state.is_processing = True
+            # Add user message to chat history and queue the query
+            submit_query(user_input.strip())
             st.rerun()
     
     st.markdown("</div>", unsafe_allow_html=True)
 
-# Process query if there's a pending one
-if st.session_state.is_processing and len(st.session_state.chat_history) > 0:
-    last_message = st.session_state.chat_history[-1]
-    if last_message["type"] == "user":
-        # Process the query through RAG system
-        response = process_query(last_message["message"])
-        
-        # Add bot response to chat history
-        st.session_state.chat_history.append({
-            "type": "bot",
-            "message": response,
-            "timestamp": time.strftime("%I:%M %p")
-        })
-        
-        st.session_state.is_processing = False
-        st.rerun()
-
 st.markdown("</div>", unsafe_allow_html=True)
 
 # ---- Footer Section ----
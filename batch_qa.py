@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import RAG_main
+from sharded_store import ShardedRetriever, query_constraints, shard_can_match
+from vector_index import higher_is_better, normalize, select_by_score
+
+# Offline question answering over the same retriever, prompt and LLM as RAG_main.
+# All questions are embedded in one batch and searched with one faiss call per
+# index; questions that retrieve the same rows share one formatted context, and
+# identical (context, question) pairs share one LLM call. Answers are appended
+# to a JSONL file as they finish, so an interrupted run resumes where it stopped.
+
+
+def read_questions(path):
+    """(id, question) pairs from a .jsonl file ({"id", "question"}) or a text file with one question per line"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                questions.append((str(record.get("id", line_no)), record["question"]))
+            else:
+                questions.append((str(line_no), line))
+    return questions
+
+
+def answered_ids(output_path):
+    """Ids already present in the output file; a truncated last line from an interrupted run is ignored"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def search_batch(questions, k):
+    """Top documents per question as lists of (doc, score), one faiss search per index"""
+    # One index version for the whole batch even if a new snapshot is swapped in meanwhile
+    retriever = RAG_main.index_manager.current().retriever
+    if isinstance(retriever, ShardedRetriever):
+        stores = [(shard["vectorstore"], shard) for shard in retriever.shards]
+    else:
+        stores = [(retriever.vectorstore, None)]
+
+    vectors = np.array(RAG_main.hf_embeddings.embed_documents([q for _, q in questions]), dtype="float32")
+    if higher_is_better(stores[0][0]):
+        vectors = normalize(vectors)
+
+    # Shards each question may use; like ShardedRetriever.select_shards, a question
+    # whose constraints rule out every shard searches all of them
+    searchable = []
+    for _, question in questions:
+        constraints = query_constraints(question)
+        selected = {n for n, (_, shard) in enumerate(stores) if shard is None or shard_can_match(shard, constraints)}
+        searchable.append(selected or set(range(len(stores))))
+
+    results = [[] for _ in questions]
+    for n, (vectorstore, shard) in enumerate(stores):
+        scores, ids = vectorstore.index.search(vectors, k)
+        # Document lookups are shared by every question that retrieved the same id
+        docs = {}
+        for row, (row_scores, row_ids) in enumerate(zip(scores, ids)):
+            if n not in searchable[row]:
+                continue
+            for score, i in zip(row_scores, row_ids):
+                if i < 0:
+                    continue
+                if i not in docs:
+                    docs[i] = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)])
+                results[row].append((docs[i], float(score)))
+
+    reverse = higher_is_better(stores[0][0])
+    return [
+        select_by_score(pairs, k, RAG_main.score_threshold, RAG_main.score_margin, reverse)
+        for pairs in results
+    ]
+
+
+def answer_batch(questions, output_path, concurrency=2, with_rows=False):
+    """
+    Answer (id, question) pairs into output_path, skipping ids it already contains.
+    with_rows adds the typed source rows of the retrieved documents to each answer.
+    """
+    done = answered_ids(output_path)
+    pending = [(qid, q) for qid, q in questions if qid not in done]
+    print(f"{len(done)} questions already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    retrieved = search_batch(pending, RAG_main.k)
+
+    # Group questions by (retrieved rows, question text) so duplicates cost one LLM call
+    contexts = {}
+    rows = {}
+    groups = {}
+    for (qid, question), pairs in zip(pending, retrieved):
+        docs = [doc for doc, _ in pairs]
+        row_ids = tuple(doc.metadata.get("row_index") for doc in docs)
+        if row_ids not in contexts:
+            contexts[row_ids] = "\n\n".join(doc.page_content for doc in docs)
+            if with_rows:
+                rows[row_ids] = RAG_main.source_records(docs)
+        groups.setdefault((row_ids, question), []).append(qid)
+    print(f"{len(groups)} LLM calls for {len(pending)} questions ({len(contexts)} distinct contexts)")
+
+    def answer(row_ids, question):
+        if not row_ids:
+            return RAG_main.no_match_answer
+        return RAG_main.generate_answer(contexts[row_ids], question)
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(answer, row_ids, question): (row_ids, question) for row_ids, question in groups}
+        for n, future in enumerate(as_completed(futures), 1):
+            row_ids, question = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # Left out of the output so the next run retries it
+                print(f"Error answering '{question}': {str(e)}")
+                continue
+            for qid in groups[(row_ids, question)]:
+                record = {
+                    "id": qid,
+                    "question": question,
+                    "answer": result,
+                    "row_ids": list(row_ids),
+                }
+                if with_rows:
+                    record["rows"] = rows[row_ids]
+                out.write(json.dumps(record) + "\n")
+            out.flush()
+            print(f"Answered {n}/{len(groups)}")
+
+    summary = RAG_main.timings()
+    if summary:
+        print(f"Average over the last {summary['calls']} LLM calls: prefill {summary['prefill_ms']:.0f} ms "
+              f"({summary['prompt_tokens']:.0f} prompt tokens evaluated), decode {summary['decode_ms']:.0f} ms, "
+              f"load {summary['load_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the RAG pipeline")
+    parser.add_argument("questions", help=".txt (one question per line) or .jsonl with id/question fields")
+    parser.add_argument("output", help="JSONL file for answers, resumed if it already exists")
+    parser.add_argument("--concurrency", type=int, default=2, help="Parallel LLM calls")
+    parser.add_argument("--with-rows", action="store_true",
+                        help="Include the typed source rows (from the Parquet dataset) behind each answer")
+    args = parser.parse_args()
+    answer_batch(read_questions(args.questions), args.output, args.concurrency, args.with_rows)
+
+
+if __name__ == "__main__":
+    main()
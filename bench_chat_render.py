@@ -0,0 +1,85 @@
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import chat_view
+from streamlit.testing.v1 import AppTest
+
+# Rerun time of the chat view against history length: the previous view (one
+# st.markdown per message, whole history kept in session state) versus
+# chat_view (recent window in one block, history capped with spill to disk).
+
+
+def legacy_script():
+    import streamlit as st
+
+    for message in st.session_state.chat_history:
+        bubble = "user" if message["type"] == "user" else "bot"
+        st.markdown(f"""
+            <div class="chat-message {bubble}-message">
+                <div class="message-bubble {bubble}-bubble">
+                    <p style="font-size: 0.9em; margin: 0;">{message["message"]}</p>
+                    <span class="message-time {bubble}-time">{message["timestamp"]}</span>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+
+
+def windowed_script():
+    import streamlit as st
+    from chat_view import init_history, render_history, trim_history
+
+    init_history(st.session_state)
+    trim_history(st.session_state)
+    render_history(st.session_state)
+
+
+def history(length, answer_chars):
+    messages = []
+    for i in range(length):
+        if i % 2 == 0:
+            messages.append({"type": "user", "message": f"Question {i} about salinity on 2019-03-14", "timestamp": "10:00 AM"})
+        else:
+            messages.append({"type": "bot", "message": "Salinity 35.1 PSU at 10 meters. " * (answer_chars // 32), "timestamp": "10:01 AM"})
+    return messages
+
+
+def time_reruns(script, length, args):
+    app = AppTest.from_function(script, default_timeout=60)
+    app.session_state["chat_history"] = history(length, args.answer_chars)
+    app.run()  # first run pays for the import and, for chat_view, the initial spill
+    timings = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(app.markdown)
+
+
+def run_benchmark(args):
+    print(f"{'messages':>10}{'legacy ms':>12}{'elements':>10}{'windowed ms':>14}{'elements':>10}")
+    for length in [int(n) for n in args.lengths.split(",")]:
+        legacy_ms, legacy_elements = time_reruns(legacy_script, length, args)
+        windowed_ms, windowed_elements = time_reruns(windowed_script, length, args)
+        print(f"{length:>10}{legacy_ms:>12.1f}{legacy_elements:>10}{windowed_ms:>14.1f}{windowed_elements:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat rerun time vs history length")
+    parser.add_argument("--lengths", default="10,50,200,1000,5000")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--answer-chars", type=int, default=600)
+    args = parser.parse_args()
+
+    # Keep the benchmark's spill files out of the real ~/.floatchat/history
+    chat_view.spill_dir = tempfile.mkdtemp(prefix="floatchat_bench_")
+    try:
+        run_benchmark(args)
+    finally:
+        shutil.rmtree(chat_view.spill_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+from sharded_store import SHARDS_DIR, is_sharded
+from snapshots import default_snapshot_root, read_current, snapshot_path
+from vector_index import (ENCODINGS, METRICS, VECTORS_FILE, build_index, bytes_per_vector, encoding_of, normalize,
+                          nprobe, set_nprobe)
+
+# Compares every index encoding against exact search on the same vectors:
+# memory per vector versus recall@k lost relative to exact (flat) search.
+
+
+def default_folder():
+    """The published snapshot (index_snapshots/<version>/), or the unversioned folder of older builds"""
+    manifest = read_current(default_snapshot_root)
+    if manifest is None:
+        return "weather_faiss_vectorstore_main"
+    return snapshot_path(default_snapshot_root, manifest["path"])
+
+
+def folder_vectors(folder):
+    if is_sharded(folder):
+        shards_dir = os.path.join(folder, SHARDS_DIR)
+        return np.concatenate([folder_vectors(os.path.join(shards_dir, name)) for name in sorted(os.listdir(shards_dir))])
+    vectors_path = os.path.join(folder, VECTORS_FILE)
+    if os.path.exists(vectors_path):
+        return np.load(vectors_path).astype("float32")
+    index = faiss.read_index(os.path.join(folder, "index.faiss"))
+    # Only flat indexes hold the exact vectors; sq8/pq would decode lossy ones and understate the loss
+    if encoding_of(index) != "flat":
+        raise ValueError(f"{folder} holds a {encoding_of(index)} index, pass the original embeddings with --vectors")
+    if isinstance(index, faiss.IndexIVF):
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def load_vectors(args):
+    if args.vectors:
+        return np.load(args.vectors).astype("float32")
+    return folder_vectors(args.folder or default_folder())
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per vector vs recall loss for each index encoding")
+    parser.add_argument("--folder", help="Index folder, defaults to the snapshot published in index_snapshots/CURRENT.json")
+    parser.add_argument("--vectors", help="Optional .npy file of float32 embeddings to use instead of the saved index")
+    parser.add_argument("--max-vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=nprobe, help="Defaults to the value load_vectorstore applies")
+    parser.add_argument("--metric", choices=METRICS, default="l2")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    if args.metric == "cosine":
+        vectors = normalize(vectors)
+    rng = np.random.default_rng(0)
+    sample = rng.permutation(len(vectors))[:args.max_vectors + args.queries]
+    queries = np.ascontiguousarray(vectors[sample[:args.queries]])
+    base = np.ascontiguousarray(vectors[sample[args.queries:]])
+    print(f"Base vectors: {base.shape}, queries: {len(queries)}, k={args.k}, nprobe={args.nprobe}")
+
+    exact = faiss.IndexFlatIP(base.shape[1]) if args.metric == "cosine" else faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    nlist = min(100, max(1, len(base) // 10))
+    print(f"{'encoding':<10}{'bytes/vec':>12}{'recall@k':>12}{'loss':>10}{'ms/query':>12}")
+    for encoding in ENCODINGS:
+        index = build_index(base, encoding, nlist, args.metric)
+        set_nprobe(index, args.nprobe)
+        encoding = encoding_of(index)
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = recall_at_k(found, truth)
+        print(f"{encoding:<10}{bytes_per_vector(index):>12.1f}{recall:>12.3f}{1 - recall:>10.3f}{elapsed_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
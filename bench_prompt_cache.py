@@ -0,0 +1,64 @@
+import argparse
+import random
+import statistics
+
+from ollama import Client
+from prompts import custom_prompt_template, legacy_prompt_template, static_prompt_prefix
+
+# Measures Ollama prefill time for the current prompt layout (static instructions
+# first) against the legacy layout (instructions after the question). Point it at
+# any local Ollama server, e.g. one running a small stand-in model, so the
+# difference comes from prefix reuse rather than the model size.
+
+questions = [
+    "What was the temperature at 10 meters on 2019-03-14?",
+    "Show salinity near latitude -12.5 longitude 65.3",
+    "What is the deepest pressure reading for station 2902746?",
+    "Compare surface salinity in January and February 2021",
+]
+
+
+def synthetic_context(rng, rows=3):
+    """Rows shaped like the embedded Argo documents"""
+    lines = []
+    for _ in range(rows):
+        lines.append(" ".join([
+            str(rng.randint(0, 10 ** 6)), f"{rng.uniform(0, 2000):.1f}", f"{rng.uniform(0, 2000):.1f}",
+            f"{rng.uniform(-2, 30):.3f}", f"{rng.uniform(30, 38):.3f}", str(rng.randint(10 ** 6, 10 ** 7)),
+            "0", f"{rng.uniform(-60, 60):.3f}", f"{rng.uniform(-180, 180):.3f}",
+            str(rng.randint(10 ** 9, 2 * 10 ** 9)), f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        ]))
+    return "\n\n".join(lines)
+
+
+def run(client, args, template, label):
+    rng = random.Random(0)
+    # One call first so the model is loaded and both layouts start from a warm server
+    client.generate(model=args.model, prompt=static_prompt_prefix, keep_alive="10m", options={"num_predict": 1})
+    prefill_ms, prompt_tokens = [], []
+    for i in range(args.calls):
+        prompt = template.format(context=synthetic_context(rng), question=questions[i % len(questions)])
+        response = dict(client.generate(model=args.model, prompt=prompt, keep_alive="10m",
+                                        options={"num_predict": args.num_predict, "temperature": 0.1}))
+        prefill_ms.append(response.get("prompt_eval_duration", 0) / 1e6)
+        prompt_tokens.append(response.get("prompt_eval_count", 0))
+    print(f"{label:<8}{statistics.mean(prefill_ms):>14.1f}{statistics.median(prefill_ms):>14.1f}"
+          f"{statistics.mean(prompt_tokens):>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefill time of the prefix-first prompt vs the legacy prompt")
+    parser.add_argument("--url", default="http://localhost:11434")
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--num-predict", type=int, default=8)
+    args = parser.parse_args()
+
+    client = Client(host=args.url)
+    print(f"{'layout':<8}{'mean prefill':>14}{'median':>14}{'prompt tokens':>16}")
+    run(client, args, legacy_prompt_template, "legacy")
+    run(client, args, custom_prompt_template, "prefix")
+
+
+if __name__ == "__main__":
+    main()
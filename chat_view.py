@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from array import array
+import uuid
+import weakref
+
+import streamlit as st
+
+# Chat history view for app.py. Only the most recent messages are rendered,
+# older ones are paged in on demand, and a session keeps at most max_history
+# messages in memory: older finished messages are spilled to a per-session
+# JSONL file and read back only when the user pages that far. Spill files live
+# in a private directory (0700, files 0600) and are deleted when their session
+# is discarded or, failing that, spill_ttl after their last write. Finished
+# messages are emitted as one markdown block per rerun; the typing indicators
+# of pending answers are rendered separately so polling re-emits only those.
+
+page_size = 20  # messages shown at first and added by each "Show older messages" click
+max_history = 100  # messages kept in session state before spilling to disk
+spill_dir = os.path.join(os.path.expanduser("~"), ".floatchat", "history")
+spill_ttl = 24 * 3600  # seconds; files of sessions that ended without cleanup are removed after this
+
+USER_MESSAGE = """
+    <div class="chat-message user-message">
+        <div class="message-bubble user-bubble">
+            <p style="font-size: 0.9em; margin: 0;">{message}</p>
+            <span class="message-time user-time">{timestamp}</span>
+        </div>
+    </div>
+"""
+
+BOT_MESSAGE = """
+    <div class="chat-message bot-message">
+        <div class="message-bubble bot-bubble">
+            <p style="font-size: 0.9em; margin: 0;">{message}</p>
+            <span class="message-time bot-time">{timestamp}</span>
+        </div>
+    </div>
+"""
+
+TYPING_INDICATOR = """
+    <div class="chat-message bot-message">
+        <div class="typing-indicator">
+            <span style="margin-right: 8px;">FloatChat is thinking</span>
+            <div class="typing-dots">
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+                <div class="typing-dot"></div>
+            </div>
+        </div>
+    </div>
+"""
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpillFile:
+    """
+    A session's spill file, deleted when the session state holding this object
+    is discarded. The byte offset of every line is kept so reading the newest
+    lines seeks straight to them instead of reading the whole file.
+    """
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory or spill_dir, f"{uuid.uuid4().hex}.jsonl")
+        self.line_offsets = array("q")
+        self._finalizer = weakref.finalize(self, remove_file, self.path)
+
+    def append(self, lines):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "ab") as f:
+            f.seek(0, os.SEEK_END)
+            for line in lines:
+                self.line_offsets.append(f.tell())
+                f.write(line.encode("utf-8"))
+
+    def last_lines(self, count):
+        """The newest `count` lines, oldest first"""
+        count = min(count, len(self.line_offsets))
+        if count <= 0 or not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.line_offsets[-count])
+            return f.read().decode("utf-8").splitlines()
+
+
+def prune_spill_files(directory=None, ttl=spill_ttl):
+    """Delete spill files not written to for ttl seconds (sessions that ended without cleanup)"""
+    directory = directory or spill_dir
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - ttl
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def init_history(state):
+    if 'chat_history' not in state:
+        state.chat_history = []
+    if 'history_shown' not in state:
+        prune_spill_files()
+        state.history_shown = page_size
+        state.spilled_count = 0
+        state.spill_file = SpillFile()
+
+
+def is_pending(message):
+    return message["type"] == "bot" and message["message"] is None
+
+
+def trim_history(state):
+    """Move the oldest finished messages beyond max_history to the session's spill file"""
+    excess = len(state.chat_history) - max_history
+    if excess <= 0:
+        return
+    spill = []
+    while len(spill) < excess and state.chat_history and not is_pending(state.chat_history[0]):
+        spill.append(state.chat_history.pop(0))
+    if not spill:
+        return
+    state.spill_file.append(
+        json.dumps({key: message[key] for key in ("type", "message", "timestamp")}) + "\n" for message in spill
+    )
+    state.spilled_count += len(spill)
+
+
+def spilled_messages(state, count):
+    """The newest `count` spilled messages, oldest first"""
+    return [json.loads(line) for line in state.spill_file.last_lines(count)]
+
+
+def message_html(message):
+    template = USER_MESSAGE if message["type"] == "user" else BOT_MESSAGE
+    return template.format(message=message["message"], timestamp=message["timestamp"])
+
+
+def show_older():
+    st.session_state.history_shown += page_size
+
+
+def render_history(state):
+    """Render the visible window of finished messages, with a button to page in older ones"""
+    total = state.spilled_count + len(state.chat_history)
+    shown = min(state.history_shown, total)
+    if shown < total:
+        st.button(f"Show older messages ({total - shown} more)", key="show_older", on_click=show_older)
+
+    from_memory = state.chat_history[max(0, len(state.chat_history) - shown):]
+    visible = spilled_messages(state, shown - len(from_memory)) + from_memory
+    finished = [message_html(m) for m in visible if not is_pending(m)]
+    if finished:
+        st.markdown("".join(finished), unsafe_allow_html=True)
+
+
+def render_pending(state, on_cancel):
+    """Typing indicator and cancel button for every answer still being computed"""
+    for message in state.chat_history:
+        if is_pending(message):
+            st.markdown(TYPING_INDICATOR, unsafe_allow_html=True)
+            st.button("Cancel", key=f"cancel_{message['job_id']}", on_click=on_cancel, args=(message["job_id"],))
@@ -0,0 +1,155 @@
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+# Array-backed docstore for the FAISS vectorstore. Document i (the FAISS id)
+# is the utf-8 slice texts[offsets[i]:offsets[i + 1]] of one text blob and
+# its metadata lives in typed columns, so a store with millions of rows is a
+# handful of numpy arrays instead of three Python objects per row. Everything
+# is saved as .npy and memory-mapped on load, which takes constant time.
+
+DOCSTORE_DIR = "docstore"
+COLUMNS_FILE = "columns.json"
+
+
+def pack_strings(values):
+    """utf-8 blob plus offsets (len(values) + 1) for a list of strings"""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(e) for e in encoded], dtype="int64", out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype="uint8"), offsets
+
+
+def column_kind(name, values):
+    present = [v for v in values if v is not None]
+    if name == "date":
+        return "date"
+    if present and all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+        return "int" if len(present) == len(values) else "float"
+    if present and all(isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool) for v in present):
+        return "float"
+    return "str"
+
+
+def parse_day(value):
+    """datetime64[D] for an ISO date-like value, NaT for missing or unparseable values ("None", "nan")"""
+    if value is None or value == "":
+        return np.datetime64("NaT", "D")
+    try:
+        return np.datetime64(str(value)[:10], "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
+
+
+class RowIdMap(Mapping):
+    """index_to_docstore_id for a CompactDocstore: FAISS id i maps to docstore id i"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise KeyError(i)
+        return int(i)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+
+class CompactDocstore(Docstore):
+    def __init__(self, texts, offsets, columns):
+        self.texts = texts
+        self.offsets = offsets
+        # name -> (kind, array) or, for kind "str", name -> ("str", (blob, offsets))
+        self.columns = columns
+
+    @classmethod
+    def from_documents(cls, docs):
+        texts, offsets = pack_strings([doc.page_content for doc in docs])
+        names = sorted({key for doc in docs for key in doc.metadata})
+        columns = {}
+        for name in names:
+            values = [doc.metadata.get(name) for doc in docs]
+            kind = column_kind(name, values)
+            if kind == "int":
+                columns[name] = (kind, np.array(values, dtype="int64"))
+            elif kind == "float":
+                # float64 so coordinates come back as stored (65.3, not 65.30000305175781)
+                columns[name] = (kind, np.array([np.nan if v is None else v for v in values], dtype="float64"))
+            elif kind == "date":
+                columns[name] = (kind, np.array([parse_day(v) for v in values], dtype="datetime64[D]"))
+            else:
+                columns[name] = (kind, pack_strings(["" if v is None else str(v) for v in values]))
+        return cls(texts, offsets, columns)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def index_to_docstore_id(self):
+        return RowIdMap(len(self))
+
+    def metadata(self, i):
+        metadata = {}
+        for name, (kind, data) in self.columns.items():
+            if kind == "str":
+                blob, offsets = data
+                metadata[name] = bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+                continue
+            value = data[i]
+            if kind == "int":
+                metadata[name] = int(value)
+            elif kind == "float" and not np.isnan(value):
+                metadata[name] = float(value)
+            elif kind == "date" and not np.isnat(value):
+                metadata[name] = str(value)
+        return metadata
+
+    def search(self, search):
+        try:
+            i = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        text = bytes(self.texts[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+        return Document(page_content=text, metadata=self.metadata(i))
+
+    def save(self, folder_path):
+        path = os.path.join(folder_path, DOCSTORE_DIR)
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "texts.npy"), self.texts)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        kinds = {}
+        for name, (kind, data) in self.columns.items():
+            kinds[name] = kind
+            if kind == "str":
+                np.save(os.path.join(path, f"meta_{name}.npy"), data[0])
+                np.save(os.path.join(path, f"meta_{name}_offsets.npy"), data[1])
+            else:
+                np.save(os.path.join(path, f"meta_{name}.npy"), data)
+        with open(os.path.join(path, COLUMNS_FILE), "w") as f:
+            json.dump(kinds, f)
+
+    @classmethod
+    def load(cls, folder_path):
+        path = os.path.join(folder_path, DOCSTORE_DIR)
+
+        def load_array(name):
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        with open(os.path.join(path, COLUMNS_FILE)) as f:
+            kinds = json.load(f)
+        columns = {}
+        for name, kind in kinds.items():
+            if kind == "str":
+                columns[name] = (kind, (load_array(f"meta_{name}.npy"), load_array(f"meta_{name}_offsets.npy")))
+            else:
+                columns[name] = (kind, load_array(f"meta_{name}.npy"))
+        return cls(load_array("texts.npy"), load_array("offsets.npy"), columns)
@@ -2,34 +2,71 @@ import faiss
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-import pandas as pd
-from langchain_community.docstore.in_memory import InMemoryDocstore
 import numpy as np
-import uuid
+import os
+import pandas as pd
+from vector_index import build_index, save_vectorstore, bytes_per_vector, encoding_of, normalize, vectorstore_kwargs
+from sharded_store import SHARDS_DIR, shard_key, shard_bounds, write_manifest
+from source_store import ROW_ID, convert_csv, is_converted, iter_chunks, row_texts
+from compact_docstore import CompactDocstore
+from snapshots import new_version, prune_snapshots, publish, snapshot_path
 
 chunks=10000
+index_encoding = "flat"  # "flat", "sq8", "pq" or "binary", see vector_index.ENCODINGS
+metric = "l2"  # "cosine" normalizes vectors and uses an inner-product index so score thresholds work
+shard_by = None  # None for a single index, "year" or "basin" to write one index per partition
+# Every run writes a new immutable snapshot and publishes it once complete;
+# a running RAG_main.py picks it up without a restart (see snapshots.py)
+snapshot_root = "index_snapshots"
+keep_snapshots = 2  # older versions kept for rollback after publishing, see snapshots.prune_snapshots
+version = new_version()
+output_folder = snapshot_path(snapshot_root, version)
+if os.path.exists(output_folder):
+    raise FileExistsError(f"Snapshot {output_folder} already exists, snapshots are immutable")
+# Columns copied into document metadata, used to partition shards and prune them at query time
+date_col, lat_col, lon_col = "date", "latitude", "longitude"
 csv_f=r"C:\Users\adity\Desktop\AI_PROJECT\RAG_Setup\argo_preprocessed_with_dates.csv"
+# Typed Parquet copy of csv_f, created on the first run (see source_store.py)
+source_dataset = "argo_dataset"
+def row_metadata(i, row):
+    metadata = {"row_index": i}
+    # Rows without a date get no "date" key rather than the string "None"/"NaT"
+    if date_col in row and pd.notna(row[date_col]):
+        metadata["date"] = str(row[date_col])
+    if lat_col in row and lon_col in row:
+        metadata["latitude"] = float(row[lat_col])
+        metadata["longitude"] = float(row[lon_col])
+    return metadata
+
 def preprocess_chunk(chunk):
-    # Combine columns into a single text string per row
+    # Combine the source columns (everything except the row id) into a single text string per row
     # Modify based on your CSV structure (e.g., select specific columns)
-    chunk['text'] = chunk.apply(lambda row: ' '.join(row.astype(str)), axis=1)
+    text_cols = [c for c in chunk.columns if c != ROW_ID]
+    chunk['text'] = row_texts(chunk, text_cols)
     # Create LangChain Documents with metadata
     return [
-        Document(page_content=text, metadata={"row_index": i})
-        for i, text in enumerate(chunk['text'], start=len(all_texts))
+        Document(page_content=text, metadata=row_metadata(int(row[ROW_ID]), row))
+        for text, (_, row) in zip(chunk['text'], chunk.iterrows())
     ]
-all_texts = []  # To track processed texts
 documents = []
 
-for chunk in pd.read_csv(csv_f, chunksize=chunks):
+# A folder left behind by an interrupted conversion has no source_meta.json and is rebuilt
+if not is_converted(source_dataset):
+    print("Converting CSV to Parquet dataset...")
+    convert_csv(csv_f, source_dataset, date_col, float64_cols=(lat_col, lon_col))
+
+for chunk in iter_chunks(source_dataset, chunks):
     chunk_docs = preprocess_chunk(chunk)
     documents.extend(chunk_docs)
-    all_texts.extend([doc.page_content for doc in chunk_docs])
     print(f"Processed chunk with {len(chunk_docs)} rows. Total rows processed: {len(documents)}")
 
+# The dataset is read partition by partition; sorting by row id makes the FAISS id
+# equal to the row id in the single-index case
+documents.sort(key=lambda doc: doc.metadata["row_index"])
+
 model_name = "sentence-transformers/all-MiniLM-L6-v2"
 model_kwargs = {'device': 'cpu'}  # Use 'cuda' if GPU available
-encode_kwargs = {'normalize_embeddings': False}
+encode_kwargs = {'normalize_embeddings': metric == "cosine"}
 
 hf_embeddings = HuggingFaceEmbeddings(
     model_name=model_name,
@@ -45,35 +82,69 @@ for i in range(0, len(texts), batch_size):
     batch = texts[i:i+batch_size]
     embeds.extend(hf_embeddings.embed_documents(batch))
 embeddings_np = np.array(embeds).astype("float32")
+if metric == "cosine":
+    embeddings_np = normalize(embeddings_np)
 print(f"Embedding array shape: {embeddings_np.shape}")
 
 
-print("Creating FAISS index...")
-dimension = embeddings_np.shape[1]
-nlist = min(100, max(1, len(documents) // 10))
-quantizer = faiss.IndexFlatL2(dimension)
-index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
-index.train(embeddings_np)
-index.add(embeddings_np)
-
-docstore = InMemoryDocstore()
-index_to_docstore_id = {}
-for i, doc in enumerate(documents):
-    doc_id = str(uuid.uuid4())
-    docstore.add({doc_id: doc})
-    index_to_docstore_id[i] = doc_id
-
-vectorstore = FAISS(
-    embedding_function=hf_embeddings,
-    index=index,
-    docstore=docstore,
-    index_to_docstore_id=index_to_docstore_id
-)
+def build_vectorstore(docs, vectors):
+    nlist = min(100, max(1, len(docs) // 10))
+    index = build_index(vectors, index_encoding, nlist, metric)
+    if encoding_of(index) != index_encoding:
+        print(f"Only {len(docs)} vectors, using {encoding_of(index)} instead of {index_encoding}")
+    print(f"Index size: {bytes_per_vector(index):.1f} bytes per vector")
+
+    # FAISS id i is document i of the compact docstore, no per-row ids or dicts
+    docstore = CompactDocstore.from_documents(docs)
+    index_to_docstore_id = docstore.index_to_docstore_id()
+
+    return FAISS(
+        embedding_function=hf_embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        **vectorstore_kwargs(metric)
+    )
+
+if shard_by is None:
+    print(f"Creating FAISS index ({index_encoding})...")
+    vectorstore = build_vectorstore(documents, embeddings_np)
+
+    print("\nSaving vectorstore...")
+    try:
+        save_vectorstore(vectorstore, output_folder, metric)
+        if index_encoding != "binary":
+            faiss.write_index(vectorstore.index, "faiss_main.bin")
+        print("Vectorstore saved successfully!")
+        saved = True
+    except Exception as e:
+        print(f"Error saving vectorstore: {str(e)}")
+        saved = False
+else:
+    partitions = {}
+    for i, doc in enumerate(documents):
+        partitions.setdefault(shard_key(doc.metadata, shard_by), []).append(i)
+
+    manifest = []
+    for name, rows in sorted(partitions.items()):
+        print(f"Creating FAISS index for shard '{name}' ({len(rows)} rows, {index_encoding})...")
+        shard_docs = [documents[i] for i in rows]
+        vectorstore = build_vectorstore(shard_docs, embeddings_np[rows])
+        try:
+            save_vectorstore(vectorstore, os.path.join(output_folder, SHARDS_DIR, name), metric)
+            manifest.append({"name": name, **shard_bounds(shard_docs)})
+        except Exception as e:
+            print(f"Error saving shard '{name}': {str(e)}")
+    write_manifest(output_folder, manifest)
+    print(f"Saved {len(manifest)} shards to {output_folder}")
+    saved = len(manifest) == len(partitions)
 
-print("\nSaving vectorstore...")
-try:
-    vectorstore.save_local("weather_faiss_vectorstore_main")
-    faiss.write_index(index, "faiss_main.bin")
-    print("Vectorstore saved successfully!")
-except Exception as e:
-    print(f"Error saving vectorstore: {str(e)}")
+# Only a complete snapshot is published
+if saved:
+    publish(snapshot_root, version, encoding=index_encoding, metric=metric, shard_by=shard_by, rows=len(documents))
+    print(f"Published index version {version}")
+    removed = prune_snapshots(snapshot_root, keep_snapshots)
+    if removed:
+        print(f"Removed old snapshots: {', '.join(removed)}")
+else:
+    print(f"Snapshot {version} is incomplete and was not published")
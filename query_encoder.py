@@ -0,0 +1,151 @@
+import argparse
+import os
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Query-side encoder for all-MiniLM-L6-v2 on onnxruntime, so answering a question
+# does not need PyTorch. The model is exported once with export_onnx_model
+# (which does need torch + transformers) and dynamically quantized to int8.
+
+default_model_name = "sentence-transformers/all-MiniLM-L6-v2"
+default_model_dir = "minilm_onnx"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+max_seq_length = 256  # same truncation as the sentence-transformers model
+
+parity_queries = [
+    "What was the temperature at 10 meters on 2019-03-14?",
+    "Show salinity near latitude -12.5 longitude 65.3",
+    "Compare Arctic ice coverage trends",
+    "Find optimal fishing zones",
+    "pressure readings for station 2902746 in 2021",
+]
+
+
+def export_onnx_model(model_name=default_model_name, output_dir=default_model_dir, quantize=True):
+    """Export the transformer to ONNX and write a dynamically int8-quantized copy next to it"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["example query"], return_tensors="pt")
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        model_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_type_ids": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=14,
+    )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    return output_dir
+
+
+class OnnxQueryEmbeddings(Embeddings):
+    """
+    Mean-pooled, L2-normalized MiniLM embeddings from onnxruntime, matching
+    the sentence-transformers pipeline (Transformer -> Pooling -> Normalize)
+    so vectors stay compatible with the index built by embed_gen.py.
+    Recent query embeddings are kept in an LRU cache.
+    """
+
+    def __init__(self, model_dir=default_model_dir, quantized=True, cache_size=1024, num_threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._cached_query = lru_cache(maxsize=cache_size)(self._embed_query)
+
+    def encode(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype="int64"),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype="int64"),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        hidden = self.session.run(None, feeds)[0]
+
+        mask = feeds["attention_mask"][..., None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype("float32")
+
+    def _embed_query(self, text):
+        return tuple(self.encode([text])[0].tolist())
+
+    def embed_query(self, text: str) -> List[float]:
+        return list(self._cached_query(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def cache_info(self):
+        return self._cached_query.cache_info()
+
+
+def check_parity(reference, candidate, queries=parity_queries, min_cosine=0.99):
+    """
+    Compare query vectors from the ONNX encoder against the PyTorch encoder.
+    int8 quantization moves individual components slightly, so the check is on
+    the cosine similarity per query; the largest absolute difference is only reported.
+    """
+    ref = np.array([reference.embed_query(q) for q in queries], dtype="float32")
+    got = np.array([candidate.embed_query(q) for q in queries], dtype="float32")
+    max_abs = float(np.abs(ref - got).max())
+    cosines = (ref * got).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(got, axis=1))
+    ok = float(cosines.min()) >= min_cosine
+    return ok, max_abs, float(cosines.min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the ONNX query encoder and check it against PyTorch")
+    parser.add_argument("--model-dir", default=default_model_dir)
+    parser.add_argument("--model-name", default=default_model_name)
+    parser.add_argument("--export", action="store_true", help="Export (and quantize) the model before checking")
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx_model(args.model_name, args.model_dir, quantize=not args.no_quantize)
+        print(f"Exported ONNX encoder to {args.model_dir}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    reference = HuggingFaceEmbeddings(model_name=args.model_name, model_kwargs={'device': 'cpu'}, encode_kwargs={'normalize_embeddings': False})
+    candidate = OnnxQueryEmbeddings(args.model_dir, quantized=not args.no_quantize)
+    ok, max_abs, min_cos = check_parity(reference, candidate)
+    print(f"Parity {'OK' if ok else 'FAILED'}: max abs diff {max_abs:.4f}, min cosine {min_cos:.4f}")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# Background execution of RAG queries for the Streamlit app. One JobQueue is
+# shared by every session: queries run on a small worker pool sized to what the
+# Ollama backend can serve in parallel, and submissions beyond max_pending are
+# refused so a saturated backend does not build up an unbounded backlog.
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_pending jobs are already waiting or running"""
+
+
+class Job:
+    def __init__(self, job_id, query):
+        self.id = job_id
+        self.query = query
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def occupies_worker(self):
+        """Unfinished, or cancelled while running and still waiting for the backend to return"""
+        return not self.finished or (self.future is not None and not self.future.done())
+
+
+class JobQueue:
+    def __init__(self, handler: Callable[[str], str], max_workers=2, max_pending=16, keep_finished_s=600):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.keep_finished_s = keep_finished_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-query")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, job):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            job.status = RUNNING
+        try:
+            result = self.handler(job.query)
+            error = None
+        except Exception as e:
+            result, error = None, str(e)
+        with self._lock:
+            # A job cancelled while running still occupies its worker until the
+            # backend returns; its answer is dropped
+            if job.status != CANCELLED:
+                job.result, job.error = result, error
+                job.status = FAILED if error else DONE
+            job.finished_at = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished_s
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.finished and not j.occupies_worker and (j.finished_at or 0) < cutoff]:
+            del self._jobs[job_id]
+
+    def active_count(self):
+        """Jobs waiting for or holding a worker, including cancelled ones the backend is still running"""
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j.occupies_worker)
+
+    def submit(self, query) -> str:
+        """Queue a query and return its job id, or raise QueueFull when the backend is saturated"""
+        with self._lock:
+            self._prune()
+            # Cancelled jobs still running count too: their workers stay busy until Ollama returns
+            if sum(1 for j in self._jobs.values() if j.occupies_worker) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} queries are already queued")
+            job = Job(uuid.uuid4().hex, query)
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id) -> bool:
+        """Cancel a pending or running job, returns False if it already finished or is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        if job.future is not None:
+            job.future.cancel()
+        return True
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from vector_index import higher_is_better, load_vectorstore, select_by_score
+
+SHARDS_DIR = "shards"
+MANIFEST_FILE = "shards.json"
+
+# Same tolerance as the prompt: nearby dates within ±7 days can still answer a question
+date_slack = timedelta(days=7)
+
+# Shared by all retrievers so a query does not pay for starting threads
+search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="shard-search")
+
+# Dates and years only count as constraints in date-like context ("in 2019",
+# "March 2019", "2019-03", "2015 to 2018"), never when followed by a unit
+# ("2000 dbar", "between 2000 and 2010 m"). Ranges are kept whole so every
+# shard inside them is searched.
+UNIT = r"\s*(?:m|km|dbar|db|meters?|metres?|psu|degrees?)\b"
+YEAR = r"(19\d{2}|20\d{2})(?!\d)"
+DATE = r"(\d{4}-\d{2}-\d{2})"
+RANGE_SEP = r"\s*(?:-|\u2013|to|through|thru|until|till|and)\s*"
+MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?"
+         r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+
+
+def parse_date(value):
+    """A date from an ISO string or date-like value, None for missing or unparseable values ("nan", "None", NaT)"""
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def ocean_basin(lat, lon):
+    """
+    Coarse ocean basin from a position in decimal degrees (longitudes in
+    either -180..180 or 0..360). Only used to partition shards, never to prune
+    them: the boxes below are not exact basin boundaries.
+    """
+    lon = (lon + 180) % 360 - 180
+    if lat >= 66:
+        return "arctic"
+    if lat <= -60:
+        return "southern"
+    if -100 <= lon < -60 and 8 <= lat < 32:
+        return "atlantic"  # Gulf of Mexico and Caribbean
+    if -6 <= lon < 42 and 30 <= lat < 66:
+        return "atlantic"  # Mediterranean, Black Sea and Baltic
+    if -70 <= lon < 20:
+        return "atlantic"
+    if 20 <= lon < 120 and lat < 30:
+        return "indian"
+    return "pacific"
+
+
+def shard_key(metadata, shard_by):
+    """Shard name for one document: its year ("year") or ocean basin ("basin")"""
+    if shard_by == "year":
+        day = parse_date(metadata.get("date"))
+        return str(day.year) if day else "unknown"
+    if shard_by == "basin":
+        if metadata.get("latitude") is None or metadata.get("longitude") is None:
+            return "unknown"
+        return ocean_basin(metadata["latitude"], metadata["longitude"])
+    raise ValueError(f"Unknown shard_by '{shard_by}', expected 'year' or 'basin'")
+
+
+def shard_bounds(docs):
+    """Date range covered by a shard, written to the manifest for pruning; rows without a valid date are ignored"""
+    dates = sorted(filter(None, (parse_date(d.metadata.get("date")) for d in docs)))
+    return {
+        "date_min": dates[0].isoformat() if dates else None,
+        "date_max": dates[-1].isoformat() if dates else None,
+        "count": len(docs),
+    }
+
+
+def write_manifest(folder_path, shards):
+    with open(os.path.join(folder_path, MANIFEST_FILE), "w") as f:
+        json.dump({"shards": shards}, f, indent=2)
+
+
+def is_sharded(folder_path):
+    return os.path.exists(os.path.join(folder_path, MANIFEST_FILE))
+
+
+def date_interval(first, last=None):
+    """Exact dates are widened by date_slack, like the prompt's nearby-date tolerance"""
+    return first - date_slack, (last or first) + date_slack
+
+
+def year_interval(first, last=None):
+    return date(int(first), 1, 1), date(int(last or first), 12, 31)
+
+
+def open_interval(keyword, year):
+    """since/from 2015 runs to the end of time, before/until 2015 from its start"""
+    year = int(year)
+    keyword = keyword.lower()
+    if keyword in ("since", "from"):
+        return date(year, 1, 1), date.max
+    if keyword == "after":
+        return date(year + 1, 1, 1), date.max
+    if keyword == "before":
+        return date.min, date(year - 1, 12, 31)
+    return date.min, date(year, 12, 31)
+
+
+def query_constraints(query):
+    """
+    Inclusive (first, last) date intervals mentioned in a question: dates, date
+    ranges, years, year ranges ("2015 to 2018", "1999-2001") and open-ended
+    years ("since 2015"). Each match is blanked out before the next pattern
+    runs, so the ends of a range are never read again as single years.
+    """
+    intervals = []
+
+    def take(pattern, to_interval):
+        def replace(match):
+            try:
+                interval = to_interval(match)
+            except (ValueError, OverflowError):
+                interval = None  # e.g. 2019-02-30
+            if interval is not None:
+                intervals.append(interval)
+            return " "
+        return re.sub(pattern, replace, text, flags=re.IGNORECASE)
+
+    text = query
+    text = take(r"\b" + DATE + RANGE_SEP + DATE + r"\b",
+                lambda m: date_interval(*sorted(date.fromisoformat(d) for d in m.groups())))
+    text = take(r"\b" + DATE + r"\b", lambda m: date_interval(date.fromisoformat(m.group(1))))
+    # A range followed by a unit is a depth or pressure range: dropped, not read as years
+    text = take(r"\b" + YEAR + RANGE_SEP + YEAR + "(" + UNIT + ")?",
+                lambda m: None if m.group(3) else year_interval(*sorted(m.group(1, 2))))
+    text = take(r"\b(since|from|after|before|until|till)\s+" + YEAR + "(?!" + UNIT + ")",
+                lambda m: open_interval(m.group(1), m.group(2)))
+    text = take(r"\b(?:in|during|through|between|and|to|of|year)\s+" + YEAR + "(?!" + UNIT + ")",
+                lambda m: year_interval(m.group(1)))
+    text = take(r"\b" + YEAR + r"-\d{2}\b", lambda m: year_interval(m.group(1)))
+    take(r"\b" + MONTH + r"\.?\s+(?:\d{1,2}(?:st|nd|rd|th)?,?\s+)?" + YEAR + "(?!" + UNIT + ")",
+         lambda m: year_interval(m.group(1)))
+    return intervals
+
+
+def shard_can_match(shard, intervals):
+    """False only when the shard's date range overlaps none of the intervals in the query"""
+    date_min, date_max = parse_date(shard.get("date_min")), parse_date(shard.get("date_max"))
+    if not intervals or date_min is None or date_max is None:
+        return True
+    return any(first <= date_max and date_min <= last for first, last in intervals)
+
+
+def load_shards(folder_path, embeddings):
+    with open(os.path.join(folder_path, MANIFEST_FILE)) as f:
+        shards = json.load(f)["shards"]
+    for shard in shards:
+        shard["vectorstore"] = load_vectorstore(os.path.join(folder_path, SHARDS_DIR, shard["name"]), embeddings)
+    return shards
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Searches every shard that can match the question in parallel threads
+    (faiss releases the GIL during search) and merges the per-shard top-k.
+    Shards must share one metric, scores are only comparable within a metric.
+    """
+
+    shards: List[Any]
+    embeddings: Any
+    k: int = 3
+    score_threshold: Optional[float] = None
+    score_margin: Optional[float] = None
+
+    def select_shards(self, query):
+        intervals = query_constraints(query)
+        selected = [s for s in self.shards if shard_can_match(s, intervals)]
+        # Nothing matches the constraints: search everything rather than answer from no context
+        return selected or self.shards
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        embedding = self.embeddings.embed_query(query)
+        shards = self.select_shards(query)
+
+        def search(shard):
+            return shard["vectorstore"].similarity_search_with_score_by_vector(embedding, k=self.k)
+
+        if len(shards) == 1:
+            results = [search(shards[0])]
+        else:
+            results = list(search_pool.map(search, shards))
+
+        merged = select_by_score(
+            [pair for shard_results in results for pair in shard_results], self.k,
+            self.score_threshold, self.score_margin, higher_is_better(shards[0]["vectorstore"])
+        )
+        return [doc for doc, _ in merged]
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Versioned, immutable index snapshots. embed_gen.py writes every build into
+# index_snapshots/<version>/ and, once it is complete, publishes it by
+# atomically replacing index_snapshots/CURRENT.json. The query side keeps the
+# loaded index in an IndexManager that polls CURRENT.json, loads a new version
+# in a background thread and swaps it in with a single reference assignment:
+# queries that already took the old LoadedIndex finish on it, and the
+# retrieval cache lives on the LoadedIndex so it never outlives its version.
+#
+# Old versions are removed by prune_snapshots (run by embed_gen.py after each
+# publish, or `python snapshots.py --keep N`). An IndexManager marks the
+# version it serves with a lease file that it renews on every poll, and a
+# version with a fresh lease is never deleted.
+
+default_snapshot_root = "index_snapshots"
+CURRENT_FILE = "CURRENT.json"
+LEASE_PREFIX = ".in_use-"
+keep_versions = 2  # unpublished versions kept before the current one, for rollback
+lease_ttl = 300  # seconds; a lease not renewed for this long belongs to a process that is gone
+VERSION_PATTERN = re.compile(r"^\d{8}-\d{6}(-[0-9a-f]+)?$")
+
+
+def new_version():
+    """Sortable by build time; the random suffix keeps builds started in the same second apart"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def snapshot_path(root, version):
+    return os.path.join(root, version)
+
+
+def publish(root, version, **info):
+    """Point CURRENT.json at a finished snapshot (write to a temp file, then atomic rename)"""
+    manifest = {"version": version, "path": version, "published_at": time.time(), **info}
+    tmp_path = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+    return manifest
+
+
+def read_current(root):
+    """The published manifest, or None when nothing has been published yet"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def in_use(path, ttl=lease_ttl):
+    """True while some IndexManager holds a fresh lease on the snapshot at path"""
+    cutoff = time.time() - ttl
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return False
+    for name in names:
+        if not name.startswith(LEASE_PREFIX):
+            continue
+        try:
+            if os.path.getmtime(os.path.join(path, name)) >= cutoff:
+                return True
+        except FileNotFoundError:
+            continue
+    return False
+
+
+def prune_snapshots(root=default_snapshot_root, keep=keep_versions):
+    """
+    Delete versions older than the published one beyond the newest `keep` of
+    them, skipping any a running IndexManager still holds. Versions newer than
+    the published one (builds in progress) are never touched. Returns the
+    deleted versions.
+    """
+    manifest = read_current(root)
+    if manifest is None:
+        return []
+    current = manifest["path"]
+    older = sorted(
+        name for name in os.listdir(root)
+        if VERSION_PATTERN.match(name) and name < current and os.path.isdir(snapshot_path(root, name))
+    )
+    removed = []
+    for name in older[:max(0, len(older) - keep)]:
+        path = snapshot_path(root, name)
+        if in_use(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+class LoadedIndex:
+    """One loaded index version with its own LRU cache of retrieved documents"""
+
+    def __init__(self, version, path, retriever, cache_size=256):
+        self.version = version
+        self.path = path
+        self.retriever = retriever
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def retrieve(self, query):
+        with self._lock:
+            if query in self._cache:
+                self._cache.move_to_end(query)
+                return self._cache[query]
+        docs = self.retriever.invoke(query)
+        with self._lock:
+            self._cache[query] = docs
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return docs
+
+
+class IndexManager:
+    """
+    Holds the current LoadedIndex. loader(path) builds a retriever for a
+    snapshot folder; fallback_path is used when no snapshot was published.
+    """
+
+    def __init__(self, loader, root=default_snapshot_root, fallback_path=None, poll_interval=30):
+        self.loader = loader
+        self.root = root
+        self.fallback_path = fallback_path
+        self.poll_interval = poll_interval
+        self._loading = threading.Lock()
+        self._watcher = None
+        self._failed = None  # (version, published_at) of a manifest whose load failed
+
+        manifest = read_current(root)
+        if manifest is not None:
+            self._current = self._load(manifest)
+        else:
+            self._current = LoadedIndex("unversioned", fallback_path, loader(fallback_path))
+        self.renew_lease()
+
+    def _load(self, manifest):
+        path = snapshot_path(self.root, manifest["path"])
+        return LoadedIndex(manifest["version"], path, self.loader(path))
+
+    def renew_lease(self):
+        """Mark the served snapshot as in use so prune_snapshots leaves it alone"""
+        if self._current.version == "unversioned":
+            return
+        lease = os.path.join(self._current.path, f"{LEASE_PREFIX}{os.getpid()}-{id(self):x}")
+        try:
+            with open(lease, "a"):
+                os.utime(lease)
+        except OSError as e:
+            print(f"Could not renew the lease on {self._current.path}: {str(e)}")
+
+    def current(self):
+        """Take this once per query and use it throughout, so a swap never mixes versions"""
+        return self._current
+
+    def refresh(self, wait=False):
+        """Load and swap in the published version if it changed, returns True if a load was started"""
+        manifest = read_current(self.root)
+        if manifest is None or manifest["version"] == self._current.version:
+            return False
+        published = (manifest["version"], manifest.get("published_at"))
+        if published == self._failed:
+            return False  # not retried until CURRENT.json is published again
+        if not self._loading.acquire(blocking=False):
+            return False  # a load is already running
+
+        def load():
+            try:
+                loaded = self._load(manifest)
+                self._current = loaded
+                # The old version's lease expires on its own, after queries still using it finished
+                self.renew_lease()
+                print(f"Switched to index version {loaded.version}")
+            except Exception as e:
+                self._failed = published
+                print(f"Error loading index version {manifest['version']}: {str(e)}")
+            finally:
+                self._loading.release()
+
+        if wait:
+            load()
+        else:
+            threading.Thread(target=load, name="index-loader", daemon=True).start()
+        return True
+
+    def start_watching(self):
+        """Poll CURRENT.json every poll_interval seconds in a daemon thread"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.poll_interval)
+                self.refresh()
+                self.renew_lease()
+
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete old index snapshots that are not published or in use")
+    parser.add_argument("--root", default=default_snapshot_root)
+    parser.add_argument("--keep", type=int, default=keep_versions, help="Older versions to keep for rollback")
+    args = parser.parse_args()
+    removed = prune_snapshots(args.root, args.keep)
+    print(f"Removed {len(removed)} snapshots: {', '.join(removed) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+# Typed, columnar copy of argo_preprocessed_with_dates.csv. The CSV is parsed
+# once by convert_csv into a Parquet dataset partitioned by year/month with
+# downcast dtypes (float32 measurements, int32 ids where the whole column fits,
+# native dates) and a row_index column holding the original CSV row number.
+# Coordinates, times and ids keep float64. The embedding pipeline and
+# query-time lookups read it back with column projection and memory mapping.
+
+default_dataset_dir = "argo_dataset"
+META_FILE = "source_meta.json"
+ROW_ID = "row_index"
+PARTITION_COLS = ["year", "month"]
+
+INT32_MIN, INT32_MAX = np.iinfo("int32").min, np.iinfo("int32").max
+
+# Float columns whose name contains one of these words keep float64: float32 has
+# ~7 significant digits, too few for positions, timestamps and numeric ids
+PRECISE_WORDS = {"lat", "latitude", "lon", "long", "longitude", "time", "timestamp", "juld",
+                 "id", "platform", "wmo", "cycle", "profile"}
+
+
+def is_precise_column(name):
+    return bool(set(re.split(r"[^a-z0-9]+", str(name).lower())) & PRECISE_WORDS)
+
+
+def scan_columns(csv_path, chunksize=100000):
+    """
+    Column kinds over the whole CSV: ("int", min, max), ("float",), ("bool",) or ("str",).
+    A column is only an int if every chunk parsed as int, so widths fit every row.
+    """
+    kinds = {}
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        for name, dtype in chunk.dtypes.items():
+            if pd.api.types.is_bool_dtype(dtype):
+                kind = ("bool",)
+            elif pd.api.types.is_integer_dtype(dtype):
+                kind = ("int", int(chunk[name].min()), int(chunk[name].max()))
+            elif pd.api.types.is_float_dtype(dtype):
+                kind = ("float",)
+            else:
+                kind = ("str",)
+            seen = kinds.get(name, kind)
+            if seen[0] == "int" and kind[0] == "int":
+                kind = ("int", min(seen[1], kind[1]), max(seen[2], kind[2]))
+            elif seen[0] != kind[0]:
+                # Mixed chunks: ints and floats widen to float, anything else becomes a string
+                kind = ("float",) if {seen[0], kind[0]} <= {"int", "float"} else ("str",)
+            kinds[name] = kind
+    return kinds
+
+
+def arrow_schema(kinds, date_col, float64_cols=()):
+    """Downcast schema from scan_columns, applied to every chunk of the CSV"""
+    fields = [pa.field(ROW_ID, pa.int32())]
+    for name, kind in kinds.items():
+        if name == date_col:
+            fields.append(pa.field(name, pa.date32()))
+        elif kind[0] == "float":
+            precise = name in float64_cols or is_precise_column(name)
+            fields.append(pa.field(name, pa.float64() if precise else pa.float32()))
+        elif kind[0] == "int":
+            fits = kind[1] >= INT32_MIN and kind[2] <= INT32_MAX
+            fields.append(pa.field(name, pa.int32() if fits else pa.int64()))
+        elif kind[0] == "bool":
+            fields.append(pa.field(name, pa.bool_()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    fields += [pa.field(col, pa.int16()) for col in PARTITION_COLS]
+    return pa.schema(fields)
+
+
+def is_converted(dataset_dir=default_dataset_dir):
+    """True once convert_csv has finished: source_meta.json is written last"""
+    return os.path.exists(os.path.join(dataset_dir, META_FILE))
+
+
+def convert_csv(csv_path, dataset_dir=default_dataset_dir, date_col="date", chunksize=100000, float64_cols=()):
+    """
+    Convert the source CSV into the partitioned Parquet dataset, returns the number of rows written.
+    The dataset is written to a temporary folder and renamed into place when complete.
+    """
+    kinds = scan_columns(csv_path, chunksize)
+    if ROW_ID in kinds:
+        raise ValueError(f"The CSV already has a '{ROW_ID}' column")
+    schema = arrow_schema(kinds, date_col, float64_cols)
+    columns = list(kinds)
+
+    tmp_dir = dataset_dir.rstrip("/\\") + ".partial"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    total = 0
+    for n, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize)):
+        chunk.insert(0, ROW_ID, np.arange(total, total + len(chunk)))
+        for name, kind in kinds.items():
+            if kind[0] == "str" and name != date_col:
+                # e.g. a column that is numeric in this chunk but text elsewhere in the file
+                chunk[name] = chunk[name].astype("string")
+        if date_col in chunk:
+            dates = pd.to_datetime(chunk[date_col], errors="coerce")
+            chunk[date_col] = dates.dt.date
+            chunk["year"] = dates.dt.year.fillna(0).astype("int16")
+            chunk["month"] = dates.dt.month.fillna(0).astype("int16")
+        else:
+            chunk["year"] = 0
+            chunk["month"] = 0
+
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        pq.write_to_dataset(
+            table, tmp_dir, partition_cols=PARTITION_COLS,
+            basename_template=f"part-{n:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        total += len(chunk)
+        print(f"Converted chunk {n} with {len(chunk)} rows. Total rows converted: {total}")
+
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump({"columns": columns, "date_col": date_col, "rows": total}, f)
+    if os.path.exists(dataset_dir):
+        shutil.rmtree(dataset_dir)  # an earlier, interrupted conversion
+    os.replace(tmp_dir, dataset_dir)
+    return total
+
+
+def source_meta(dataset_dir=default_dataset_dir):
+    with open(os.path.join(dataset_dir, META_FILE)) as f:
+        return json.load(f)
+
+
+def open_dataset(dataset_dir=default_dataset_dir):
+    """Open the dataset with memory-mapped reads and year/month taken from the directory names"""
+    partitioning = ds.partitioning(pa.schema([(col, pa.int16()) for col in PARTITION_COLS]), flavor="hive")
+    return ds.dataset(dataset_dir, format="parquet", partitioning=partitioning,
+                      filesystem=pafs.LocalFileSystem(use_mmap=True), exclude_invalid_files=True)
+
+
+def iter_chunks(dataset_dir=default_dataset_dir, batch_size=10000, columns=None, row_filter=None):
+    """
+    Yield pandas DataFrames of up to batch_size rows. By default the projection is
+    row_index plus the original CSV columns in CSV order (no year/month).
+    """
+    if columns is None:
+        columns = [ROW_ID] + source_meta(dataset_dir)["columns"]
+    for batch in open_dataset(dataset_dir).to_batches(columns=columns, filter=row_filter, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def row_texts(frame, columns):
+    """
+    One space-separated string per row, formatted like the CSV values: float32
+    columns use their shortest float32 repr (35.123, not 35.12300109863281)
+    and missing values are "nan", as pandas prints them when reading the CSV.
+    """
+    parts = []
+    for name in columns:
+        values = frame[name]
+        if pd.api.types.is_float_dtype(values.dtype):
+            # numpy formats each value with the shortest repr of its own dtype
+            parts.append(pd.Series(values.to_numpy().astype(str), index=frame.index))
+        else:
+            parts.append(values.astype(str).where(values.notna(), "nan"))
+    return parts[0].str.cat(parts[1:], sep=" ")
+
+
+def lookup_rows(row_ids, dataset_dir=default_dataset_dir, columns=None, dates=None):
+    """
+    Typed source rows for the given row ids, in the order the ids were given.
+    Passing the dates of the dated rows lets the scan skip every other year/month
+    partition; the year=0/month=0 partition of undated rows is always scanned.
+    """
+    row_ids = [int(r) for r in row_ids]
+    if columns is None:
+        columns = [ROW_ID] + source_meta(dataset_dir)["columns"]
+    elif ROW_ID not in columns:
+        columns = [ROW_ID] + list(columns)
+
+    row_filter = ds.field(ROW_ID).isin(row_ids)
+    if dates:
+        months = {(d.year, d.month) for d in pd.to_datetime(list(dates), errors="coerce").dropna()}
+        if months:
+            # Rows without a date were written with year = month = 0
+            partition_filter = (ds.field("year") == 0) & (ds.field("month") == 0)
+            for year, month in months:
+                partition_filter = partition_filter | ((ds.field("year") == year) & (ds.field("month") == month))
+            row_filter = row_filter & partition_filter
+
+    table = open_dataset(dataset_dir).to_table(columns=columns, filter=row_filter)
+    frame = table.to_pandas().set_index(ROW_ID)
+    return frame.reindex([r for r in row_ids if r in frame.index])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Argo CSV into a partitioned Parquet dataset")
+    parser.add_argument("csv_path")
+    parser.add_argument("--dataset-dir", default=default_dataset_dir)
+    parser.add_argument("--date-col", default="date")
+    args = parser.parse_args()
+    rows = convert_csv(args.csv_path, args.dataset_dir, args.date_col)
+    print(f"Wrote {rows} rows to {args.dataset_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import json
+import os
+import pickle
+from typing import Any, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from compact_docstore import CompactDocstore
+
+# Supported index encodings, from largest/most exact to smallest
+# flat   - IndexIVFFlat, full float32 vectors (4 bytes per dimension)
+# sq8    - IndexIVFScalarQuantizer, int8 scalar quantization (1 byte per dimension)
+# pq     - IndexIVFPQ, product quantization (pq_m bytes per vector)
+# binary - IndexBinaryFlat sign codes (1 bit per dimension), re-scored with float vectors kept on disk
+ENCODINGS = ("flat", "sq8", "pq", "binary")
+
+# l2     - squared L2 distance on raw embeddings, smaller is closer
+# cosine - vectors L2-normalized at ingestion and query time, inner-product index,
+#          scores are cosine similarities in [-1, 1] and larger is closer
+METRICS = ("l2", "cosine")
+
+META_FILE = "index_meta.json"
+VECTORS_FILE = "vectors.npy"
+
+pq_m = 48              # sub-quantizers for pq, must divide the embedding dimension
+pq_nbits = 8           # pq needs at least 2**pq_nbits training vectors, smaller inputs fall back to sq8
+rescore_factor = 10    # binary: candidates fetched per requested result before float re-scoring
+nprobe = 10            # IVF lists visited per query, saved with the index and applied on load
+
+
+def binarize(vectors):
+    """Pack the sign of every component into bits (d/8 bytes per vector)"""
+    vectors = np.asarray(vectors, dtype="float32")
+    return np.packbits(vectors > 0, axis=1)
+
+
+class BinaryRescoreIndex:
+    """
+    Hamming search over binary codes followed by exact re-scoring of the top
+    candidates (L2 distance, or inner product for the cosine metric). Exposes
+    the small part of the faiss.Index interface that the LangChain FAISS
+    wrapper uses for search (d, ntotal, search).
+    """
+
+    def __init__(self, binary_index, vectors, rescore_factor=rescore_factor, metric="l2"):
+        self.binary_index = binary_index
+        self.vectors = vectors  # float32 array, usually np.load(..., mmap_mode="r")
+        self.rescore_factor = rescore_factor
+        self.metric = metric
+        self.d = vectors.shape[1]
+
+    @property
+    def ntotal(self):
+        return self.binary_index.ntotal
+
+    def search(self, x, k):
+        x = np.asarray(x, dtype="float32")
+        n_candidates = min(self.ntotal, k * self.rescore_factor)
+        _, candidates = self.binary_index.search(binarize(x), n_candidates)
+
+        higher_is_better = self.metric == "cosine"
+        distances = np.full((len(x), k), -np.inf if higher_is_better else np.inf, dtype="float32")
+        labels = np.full((len(x), k), -1, dtype="int64")
+        for row, query in enumerate(x):
+            ids = candidates[row][candidates[row] >= 0]
+            if len(ids) == 0:
+                continue
+            # Sorted ids keep the memory-mapped reads sequential
+            ids = np.sort(ids)
+            candidates_np = np.asarray(self.vectors[ids])
+            if higher_is_better:
+                dists = candidates_np @ query
+                order = np.argsort(-dists)[:k]
+            else:
+                dists = ((candidates_np - query) ** 2).sum(axis=1)
+                order = np.argsort(dists)[:k]
+            distances[row, :len(order)] = dists[order]
+            labels[row, :len(order)] = ids[order]
+        return distances, labels
+
+
+def normalize(embeddings_np):
+    """L2-normalize a float32 array in place and return it"""
+    embeddings_np = np.ascontiguousarray(embeddings_np, dtype="float32")
+    faiss.normalize_L2(embeddings_np)
+    return embeddings_np
+
+
+def fit_encoding(encoding, n_vectors):
+    """The encoding build_index actually uses for n_vectors training vectors"""
+    if encoding == "pq" and n_vectors < 2 ** pq_nbits:
+        return "sq8"
+    return encoding
+
+
+def encoding_of(index):
+    if isinstance(index, BinaryRescoreIndex):
+        return "binary"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return "sq8"
+    return "flat"
+
+
+def set_nprobe(index, n_probe):
+    """Set nprobe on an IVF index (capped at nlist); other indexes are left as they are"""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = max(1, min(n_probe, index.nlist))
+
+
+def build_index(embeddings_np, encoding="flat", nlist=100, metric="l2"):
+    """
+    Train and fill a faiss index for the given encoding. For the cosine metric
+    the caller passes vectors that are already normalized (see normalize).
+    pq falls back to sq8 when there are too few vectors to train its codebooks.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown index encoding '{encoding}', expected one of {ENCODINGS}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+    encoding = fit_encoding(encoding, len(embeddings_np))
+
+    dimension = embeddings_np.shape[1]
+    if encoding == "binary":
+        index = faiss.IndexBinaryFlat(dimension)
+        index.add(binarize(embeddings_np))
+        return BinaryRescoreIndex(index, embeddings_np, metric=metric)
+
+    if metric == "cosine":
+        quantizer, faiss_metric = faiss.IndexFlatIP(dimension), faiss.METRIC_INNER_PRODUCT
+    else:
+        quantizer, faiss_metric = faiss.IndexFlatL2(dimension), faiss.METRIC_L2
+    if encoding == "flat":
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+    elif encoding == "sq8":
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits, faiss_metric)
+    index.train(embeddings_np)
+    index.add(embeddings_np)
+    set_nprobe(index, nprobe)
+    return index
+
+
+def bytes_per_vector(index):
+    """Serialized size of the index divided by the number of vectors it holds"""
+    if isinstance(index, BinaryRescoreIndex):
+        # Only the codes stay in RAM, the float vectors are memory-mapped from disk
+        data = faiss.serialize_index_binary(index.binary_index)
+    else:
+        data = faiss.serialize_index(index)
+    return data.nbytes / max(1, index.ntotal)
+
+
+def vectorstore_kwargs(metric):
+    """FAISS wrapper arguments for a metric, so queries are normalized and scores compared the right way"""
+    if metric == "cosine":
+        return {"normalize_L2": True, "distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT}
+    return {}
+
+
+def higher_is_better(vectorstore):
+    return vectorstore.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+
+
+def save_vectorstore(vectorstore, folder_path, metric="l2", n_probe=nprobe):
+    """Save a vectorstore built by build_index, plus the metadata needed to load it back"""
+    os.makedirs(folder_path, exist_ok=True)
+    index = vectorstore.index
+    if isinstance(index, BinaryRescoreIndex):
+        faiss.write_index_binary(index.binary_index, os.path.join(folder_path, "index.faiss"))
+        np.save(os.path.join(folder_path, VECTORS_FILE), np.asarray(index.vectors, dtype="float32"))
+    else:
+        faiss.write_index(index, os.path.join(folder_path, "index.faiss"))
+
+    if isinstance(vectorstore.docstore, CompactDocstore):
+        vectorstore.docstore.save(folder_path)
+        docstore_format = "compact"
+    else:
+        with open(os.path.join(folder_path, "index.pkl"), "wb") as f:
+            pickle.dump((vectorstore.docstore, vectorstore.index_to_docstore_id), f)
+        docstore_format = "pickle"
+
+    with open(os.path.join(folder_path, META_FILE), "w") as f:
+        json.dump({"encoding": encoding_of(index), "metric": metric, "docstore": docstore_format,
+                   "dimension": index.d, "ntotal": index.ntotal, "nprobe": n_probe}, f)
+
+
+def load_vectorstore(folder_path, embeddings):
+    """Load a vectorstore saved by save_vectorstore (or a plain FAISS.save_local folder)"""
+    meta_path = os.path.join(folder_path, META_FILE)
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    metric = meta.get("metric", "l2")
+
+    if meta.get("encoding") == "binary":
+        binary_index = faiss.read_index_binary(os.path.join(folder_path, "index.faiss"))
+        vectors = np.load(os.path.join(folder_path, VECTORS_FILE), mmap_mode="r")
+        index = BinaryRescoreIndex(binary_index, vectors, metric=metric)
+    else:
+        index = faiss.read_index(os.path.join(folder_path, "index.faiss"))
+        # nprobe is not part of the serialized index and would otherwise be 1
+        set_nprobe(index, meta.get("nprobe", nprobe))
+
+    if meta.get("docstore") == "compact":
+        docstore = CompactDocstore.load(folder_path)
+        index_to_docstore_id = docstore.index_to_docstore_id()
+    else:
+        # uuid-keyed InMemoryDocstore pickled by older builds or FAISS.save_local
+        with open(os.path.join(folder_path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        **vectorstore_kwargs(metric)
+    )
+
+
+def select_by_score(pairs, k, score_threshold=None, score_margin=None, higher_is_better=False):
+    """
+    Dynamic k: sort (doc, score) pairs best first, keep at most k, drop those
+    worse than score_threshold and those more than score_margin behind the
+    best match. Returns an empty list when nothing is close enough.
+    """
+    pairs = sorted(pairs, key=lambda p: p[1], reverse=higher_is_better)[:k]
+    if score_threshold is not None:
+        if higher_is_better:
+            pairs = [p for p in pairs if p[1] >= score_threshold]
+        else:
+            pairs = [p for p in pairs if p[1] <= score_threshold]
+    if score_margin is not None and pairs:
+        best = pairs[0][1]
+        pairs = [p for p in pairs if abs(best - p[1]) <= score_margin]
+    return pairs
+
+
+class ScoredRetriever(BaseRetriever):
+    """Similarity retriever over one vectorstore that applies select_by_score cutoffs"""
+
+    vectorstore: Any
+    k: int = 3
+    score_threshold: Optional[float] = None
+    score_margin: Optional[float] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        pairs = self.vectorstore.similarity_search_with_score(query, k=self.k)
+        pairs = select_by_score(pairs, self.k, self.score_threshold, self.score_margin,
+                                higher_is_better(self.vectorstore))
+        return [doc for doc, _ in pairs]